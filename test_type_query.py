@@ -0,0 +1,686 @@
+# test_type_query.py
+"""
+type_query_engine 可执行测试
+- 文档用例：type_query_test.md 第2节中的测试用例
+- 穷举校验：18种攻击属性 × 171种防御属性组合，各快速查询路径与直接由
+  pokemon_type_chart.json 计算的参考结果逐项比对（数据中的“克制/被克制”冲突见 KNOWN_CHART_CONFLICTS）
+- 性能断言：单次查询延迟、命令行启动时间（--type、--name）超过阈值即失败
+  （阈值可用环境变量 TYPE_QUERY_MAX_QUERY_MS、TYPE_QUERY_MAX_STARTUP_S 调整）
+
+运行：python -m pytest -q
+"""
+import csv
+import io
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import type_query_engine as te
+
+# 测试用名称映射表（覆盖文档用例中的宝可梦）
+NAME_TYPE_MAP = {
+    '皮卡丘': {'属性': ['电'], '别名': ['Pikachu', 'ピカチュウ']},
+    '妙蛙种子': {'属性': ['草', '毒'], '别名': ['Bulbasaur', 'フシギダネ']},
+    '喷火龙': {'属性': ['火', '飞行'], '别名': ['Charizard', 'リザードン']},
+    '耿鬼': {'属性': ['幽灵', '毒'], '别名': ['Gengar']},
+    '水箭龟': {'属性': ['水'], '别名': ['Blastoise']},
+    '路卡利欧': {'属性': ['格斗', '钢'], '别名': ['Lucario']},
+    '超梦': ['超能'],
+    '卡比兽': '一般',
+    '卡璞・鸣鸣': {'属性': ['电', '妖精'], '别名': ['Tapu Koko']},
+    '凤王': {'属性': ['火', '飞行'], '别名': ['Ho-Oh']},
+}
+
+MAX_QUERY_MS = float(os.environ.get('TYPE_QUERY_MAX_QUERY_MS', '1.0'))
+MAX_STARTUP_S = float(os.environ.get('TYPE_QUERY_MAX_STARTUP_S', '1.0'))
+
+
+@pytest.fixture(scope='module')
+def name_map_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp('data') / 'pokemon_name_type_map.json'
+    path.write_text(json.dumps(NAME_TYPE_MAP, ensure_ascii=False), encoding='utf-8')
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def engine(name_map_path):
+    return te.TypeEngine(name_type_map_path=name_map_path)
+
+
+# --- 参考实现：直接读取 pokemon_type_chart.json 逐项计算 ---
+
+with open(te.TYPE_CHART_PATH, encoding='utf-8') as _f:
+    CHART = json.load(_f)
+TYPES = [item['属性'] for item in CHART]
+COMBOS = [(t,) for t in TYPES] + list(itertools.combinations(TYPES, 2))
+
+
+# 属性克制表中同时列在“克制”和“被克制”里的（攻击属性, 防御属性）及查询引擎采用的倍率。
+# 数据本身有歧义，参考实现不推断取舍规则，只接受此处逐项记录的取值；
+# 数据文件出现新的冲突时 reference_multiplier 直接报错。
+# 注：格斗→妖精在正式游戏中为0.5倍，此处按数据文件的“克制”计为2倍。
+KNOWN_CHART_CONFLICTS = {
+    ('格斗', '妖精'): 2.0,
+    ('幽灵', '幽灵'): 2.0,
+}
+
+
+def reference_multiplier(attacker, defenders):
+    """攻击属性对防御属性组合的倍率，由 pokemon_type_chart.json 逐项计算"""
+    record = next(item for item in CHART if item['属性'] == attacker)
+    result = 1.0
+    for defender in defenders:
+        groups = [g for g in ('克制', '被克制', '无效') if defender in record.get(g, [])]
+        if len(groups) > 1:
+            assert (attacker, defender) in KNOWN_CHART_CONFLICTS, f'未记录的数据冲突: {attacker}→{defender}'
+            result *= KNOWN_CHART_CONFLICTS[(attacker, defender)]
+        elif groups:
+            result *= {'克制': 2.0, '被克制': 0.5, '无效': 0.0}[groups[0]]
+    return result
+
+
+def reference_best(attacker, defenders):
+    """攻击方本系属性对防御属性组合的最佳倍率"""
+    return max(reference_multiplier(t, defenders) for t in attacker)
+
+
+def reference_grid(attackers, defenders):
+    return [[reference_best(a, d) for d in defenders] for a in attackers]
+
+
+# --- 文档用例（type_query_test.md 第2节） ---
+
+TYPE_CASES = [
+    # (编号, 输入, 克制至少包含, 被克制至少包含)
+    (1, '火', {'虫', '钢', '草', '冰'}, {'岩石', '火', '水', '龙'}),
+    (2, '水', {'火', '地面', '岩石'}, {'水', '草', '龙'}),
+    (3, '电', {'水', '飞行'}, {'地面', '草', '龙', '电'}),
+    (4, '草', {'水', '地面', '岩石'}, {'火', '草', '毒', '飞行', '虫', '龙', '钢'}),
+    (5, '一般', set(), {'格斗'}),
+    (6, '火, 飞行', {'虫', '钢', '草', '冰', '格斗'}, set()),
+    (7, '水, 地面', {'火', '地面', '岩石', '毒'}, set()),
+    (8, '草, 毒', {'水', '地面', '岩石', '草', '妖精'}, set()),
+    (13, 'fire', {'虫', '钢', '草', '冰'}, {'岩石', '火', '水', '龙'}),
+    (14, 'ほのお', {'虫', '钢', '草', '冰'}, {'岩石', '火', '水', '龙'}),
+    # 文档中飞行的“被克制”摘要含“冰”，与属性克制表不符，此处只校验“克制”
+    (15, '飞行系', {'草', '格斗', '虫'}, set()),
+]
+
+NAME_CASES = [
+    # (编号, 输入, 属性, 克制至少包含)
+    (9, '皮卡丘', ['电'], {'水', '飞行'}),
+    (10, '妙蛙种子', ['草', '毒'], {'水', '地面', '岩石', '草', '妖精'}),
+    (11, '喷火龙', ['火', '飞行'], {'虫', '钢', '草', '冰', '格斗'}),
+    (12, 'Gengar', ['幽灵', '毒'], {'幽灵', '超能力', '草', '妖精'}),
+    (16, 'Charizard', ['火', '飞行'], {'虫', '钢', '草', '冰', '格斗'}),
+    (17, 'ピカチュウ', ['电'], {'水', '飞行'}),
+]
+
+
+@pytest.mark.parametrize('case_id, text, super_effective, not_very_effective', TYPE_CASES)
+def test_documented_type_cases(engine, case_id, text, super_effective, not_very_effective):
+    result = engine.query_types([text])
+    assert result['提示'] == ''
+    assert super_effective <= set(result['结果']['克制'])
+    assert not_very_effective <= set(result['结果']['被克制'])
+
+
+@pytest.mark.parametrize('case_id, name, types, super_effective', NAME_CASES)
+def test_documented_name_cases(engine, case_id, name, types, super_effective):
+    result = engine.query_name(name)
+    assert result['属性'] == types
+    assert super_effective <= set(result['结果']['克制'])
+
+
+@pytest.mark.parametrize('text', ['', '???'])
+def test_documented_invalid_input(engine, text):
+    result = engine.query_types([text])
+    assert result['结果'] is None
+    assert result['提示']
+
+
+def test_documented_partial_invalid_input(engine):
+    result = engine.query_types(['电, 火, ???'])
+    assert result['属性'] == ['电', '火']
+    assert '???' in result['提示']
+
+
+def test_documented_compound_without_separator(engine):
+    assert engine.query_types(['地龙'])['属性'] == ['地面', '龙']
+
+
+def test_unknown_name(engine):
+    result = engine.query_name('不存在的宝可梦')
+    assert result['结果'] is None and result['提示']
+
+
+# --- 穷举校验：18 × 171 ---
+
+def test_chart_conflicts_are_known(engine):
+    engine.defense_multipliers(['火'])
+    assert set(engine.chart_conflicts) == set(KNOWN_CHART_CONFLICTS)
+    for (attacker, defender), multiplier in KNOWN_CHART_CONFLICTS.items():
+        assert engine.defense_multipliers([defender])[TYPES.index(attacker)] == multiplier
+
+
+def test_combo_count():
+    assert len(TYPES) == 18
+    assert len(COMBOS) == 171
+
+
+@pytest.mark.parametrize('combo', COMBOS, ids='+'.join)
+def test_defense_multipliers_match_reference(engine, combo):
+    expected = [reference_multiplier(attacker, combo) for attacker in TYPES]
+    assert engine.defense_multipliers(list(combo)) == expected
+    relations = engine.relations(list(combo))
+    assert list(relations['倍率'].values()) == expected
+    assert relations['被克制于'] == [t for t, m in zip(TYPES, expected) if m > 1]
+    assert relations['抵抗'] == [t for t, m in zip(TYPES, expected) if 0 < m < 1]
+    assert relations['免疫'] == [t for t, m in zip(TYPES, expected) if m == 0]
+
+
+def test_matchup_grid_matches_reference(engine):
+    attackers = [[t] for t in TYPES]
+    grid = engine.matchup_grid(attackers, [list(c) for c in COMBOS])
+    for i, attacker in enumerate(TYPES):
+        for j, combo in enumerate(COMBOS):
+            assert grid[i][j] == reference_multiplier(attacker, combo)
+
+
+def test_combo_profiles_match_reference(engine):
+    profiles = dict(engine.iter_combo_profiles())
+    assert set(profiles) == set(COMBOS)
+    for combo, vector in profiles.items():
+        assert vector == [reference_multiplier(attacker, combo) for attacker in TYPES]
+
+
+def test_cached_relations_match_reference(name_map_path, tmp_path):
+    cache = te.open_result_cache(te.TYPE_CHART_PATH, name_map_path, str(tmp_path / 'cache.sqlite3'))
+    for _ in range(2):  # 第一次写入缓存，第二次全部命中
+        cached = te.TypeEngine(name_type_map_path=name_map_path, cache=cache)
+        for combo in COMBOS:
+            multipliers = cached.relations(list(combo))['倍率']
+            assert list(multipliers.values()) == [reference_multiplier(a, combo) for a in TYPES]
+    cache.close()
+
+
+def test_cache_invalidated_by_version(name_map_path, tmp_path, monkeypatch):
+    path = str(tmp_path / 'cache.sqlite3')
+    cache = te.open_result_cache(te.TYPE_CHART_PATH, name_map_path, path)
+    cache.put('name', 'x', ['x', ['火']])
+    cache.close()
+    cache = te.open_result_cache(te.TYPE_CHART_PATH, name_map_path, path)
+    assert cache.get('name', 'x') == ['x', ['火']]
+    cache.close()
+    monkeypatch.setattr(te, 'CACHE_VERSION', te.CACHE_VERSION + 1)
+    cache = te.open_result_cache(te.TYPE_CHART_PATH, name_map_path, path)
+    assert cache.get('name', 'x') is None
+    cache.close()
+
+
+def test_cache_invalidated_by_data_change(tmp_path):
+    map_path = tmp_path / 'names.json'
+    chart_path = tmp_path / 'chart.json'
+    chart_path.write_text(json.dumps(CHART, ensure_ascii=False), encoding='utf-8')
+    cache_path = str(tmp_path / 'cache.sqlite3')
+
+    def query(name):
+        cache = te.open_result_cache(str(chart_path), str(map_path), cache_path)
+        try:
+            return te.TypeEngine(str(chart_path), str(map_path), cache=cache).query_name(name)
+        finally:
+            cache.close()
+
+    map_path.write_text(json.dumps({'测试兽': ['火']}, ensure_ascii=False), encoding='utf-8')
+    assert query('测试兽')['属性'] == ['火']
+    assert query('测试兽')['属性'] == ['火']  # 命中缓存
+    map_path.write_text(json.dumps({'测试兽': ['水']}, ensure_ascii=False), encoding='utf-8')
+    assert query('测试兽')['属性'] == ['水']
+
+    # 修改属性克制表：水不再克制火
+    chart = json.loads(chart_path.read_text(encoding='utf-8'))
+    next(item for item in chart if item['属性'] == '草')['克制'].remove('水')
+    before = query('测试兽')['结果']
+    chart_path.write_text(json.dumps(chart, ensure_ascii=False), encoding='utf-8')
+    after = query('测试兽')['结果']
+    assert '草' in before['被克制于'] and '草' not in after['被克制于']
+
+
+# --- 复合输入分词 ---
+
+def test_tokenizer_resolves_every_alias_pair():
+    for (first, a), (second, b) in itertools.permutations(te.TYPE_ALIASES.items(), 2):
+        for text in (f'{a[0]}/{b[0]}', f'{a[-1]} {b[-1]}'):
+            assert [t['标准'] for t in te.tokenize_types(text)] == [first, second]
+
+
+def test_engine_tokenize_natural_spellings(engine):
+    tokens = engine.tokenize('Tapu Koko vs 皮卡丘, Ho-Oh和草系')
+    assert [(t['类别'], t['标准']) for t in tokens] == [
+        ('宝可梦', '卡璞・鸣鸣'), ('未识别', None), ('宝可梦', '皮卡丘'),
+        ('宝可梦', '凤王'), ('未识别', None), ('属性', '草')]
+    assert [t['文本'] for t in tokens if t['类别'] == '未识别'] == ['vs', '和']
+
+
+@pytest.fixture(scope='module')
+def app(tmp_path_factory):
+    """
+    加载 type_query_app.py：该文件导入时即读取同目录（及当前目录）下的数据文件，
+    而仓库中的名称映射表为占位文件，因此复制到临时目录并配合测试用映射表加载
+    """
+    import importlib.util
+    import shutil
+    work = tmp_path_factory.mktemp('app')
+    shutil.copy(os.path.join(te.BASE_DIR, 'type_query_app.py'), work)
+    shutil.copy(te.TYPE_CHART_PATH, work)
+    (work / 'pokemon_name_type_map.json').write_text(
+        json.dumps({k: te._name_entry(k, v)[1] for k, v in NAME_TYPE_MAP.items()}, ensure_ascii=False),
+        encoding='utf-8')
+    cwd = os.getcwd()
+    os.chdir(work)
+    try:
+        spec = importlib.util.spec_from_file_location('type_query_app_under_test', work / 'type_query_app.py')
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        os.chdir(cwd)
+    return module
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('草/毒', ['草', '毒']),
+    ('地龙', ['地面', '龙']),
+    ('psychic', ['超能']),
+    ('ひのこ', ['火']),
+    ('火系fire, water', ['火', '水']),
+    (['超能力', 'ice', '草 毒'], ['超能', '冰', '草', '毒']),
+])
+def test_app_standardize_multi_type_input(app, text, expected):
+    assert app.standardize_multi_type_input(text) == expected
+    assert app.standardize_multi_type_input(text, return_invalid=True) == (expected, [])
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('皮卡丘喷火龙', ['皮卡丘', '喷火龙']),
+    ('皮卡丘 / Charizard', ['皮卡丘', '喷火龙']),
+    (['Pika chu', 'ファイヤー'], ['皮卡丘', '火焰鸟']),
+])
+def test_app_standardize_multi_name_input(app, text, expected):
+    assert app.standardize_multi_name_input(text) == expected
+
+
+def test_app_multi_input_reports_unrecognised(app):
+    assert app.standardize_multi_type_input('火x龙') == []
+    assert app.standardize_multi_type_input(['火', '???'], return_invalid=True) == (['火'], ['???'])
+    assert app.standardize_multi_type_input(None, return_invalid=True) == ([], [None])
+    assert app.standardize_multi_name_input('皮卡丘和喷火龙', return_invalid=True) == (['皮卡丘', '喷火龙'], ['和'])
+    assert app.standardize_multi_name_input('皮卡丘和喷火龙') == []
+
+
+# --- 名称映射表流式加载 ---
+
+def _expected_records(mapping):
+    return [te._name_entry(name, value) for name, value in mapping.items()]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 7, 16, 1 << 16])
+def test_json_object_stream_chunk_boundaries(chunk_size):
+    mapping = dict(NAME_TYPE_MAP, **{'数字': {'属性': ['电'], '别名': ['12345']},
+                                     'esc"aped': ['水'], '': []})
+    raw = ('\ufeff' + json.dumps(mapping, ensure_ascii=False, indent=1)).encode('utf-8')
+    stream = te._JsonObjectStream(io.BytesIO(raw), chunk_size)
+    assert [te._name_entry(k, v) for k, v in stream.items()] == _expected_records(mapping)
+
+
+@pytest.mark.parametrize('text', ['{}', ' { } '])
+def test_json_object_stream_empty(text):
+    assert list(te._JsonObjectStream(io.BytesIO(text.encode()), 1).items()) == []
+
+
+@pytest.mark.parametrize('text', ['[]', '{"a": ["火"]', '{"a" ["火"]}', '{"a": ["火"] "b": []}'])
+def test_json_object_stream_malformed(text):
+    with pytest.raises(ValueError):
+        list(te._JsonObjectStream(io.BytesIO(text.encode()), 2).items())
+
+
+def test_iter_name_records_json_and_jsonl(name_map_path, tmp_path):
+    expected = _expected_records(NAME_TYPE_MAP)
+    reports = []
+    records = list(te.iter_name_records(name_map_path, lambda *a: reports.append(a), chunk_size=3))
+    assert records == expected
+    assert reports[-1][0] == len(expected) and reports[-1][1] == reports[-1][2]
+
+    path = tmp_path / 'names.jsonl'
+    lines = [json.dumps({'名称': name, '属性': types, '别名': aliases}, ensure_ascii=False)
+             for name, types, aliases in expected[:4]]
+    lines += ['', json.dumps(dict(list(NAME_TYPE_MAP.items())[4:]), ensure_ascii=False)]
+    path.write_text('\n'.join(lines), encoding='utf-8')
+    assert list(te.iter_name_records(str(path))) == expected
+
+
+@pytest.mark.parametrize('value', [5, None, [1], {'属性': 5}, {'属性': ['电'], '别名': 'x'}])
+def test_name_entry_rejects_bad_values(value):
+    with pytest.raises(ValueError, match='名称映射表格式错误'):
+        te._name_entry('怪', value)
+
+
+def test_name_index_skips_unresolved_types(tmp_path):
+    mapping = {'皮卡丘': ['电'], '半怪': ['火', '???'], '三属性': ['火', '水', '草'], '无属性': [],
+               '怪': {'属性': '???', '别名': ['Monster']}}
+    path = tmp_path / 'names.json'
+    path.write_text(json.dumps(mapping, ensure_ascii=False), encoding='utf-8')
+    loaded = te.TypeEngine(name_type_map_path=str(path))
+    assert loaded.resolve_name('皮卡丘') == ('皮卡丘', ['电'])
+    for name in ('半怪', '三属性', '无属性', '怪', 'Monster'):
+        assert loaded.resolve_name(name) is None
+    assert loaded.skipped_names == ['半怪', '三属性', '无属性', '怪']
+
+
+def test_partial_loading(name_map_path, monkeypatch):
+    first_loaded, release = te.threading.Event(), te.threading.Event()
+    iter_name_records = te.iter_name_records
+
+    def gated_records(path, progress=None):
+        records = iter_name_records(path)
+        yield next(records)
+        first_loaded.set()
+        release.wait(5)
+        yield from records
+
+    monkeypatch.setattr(te, 'iter_name_records', gated_records)
+    partial = te.TypeEngine(name_type_map_path=name_map_path)
+    partial.load_names(background=True, partial=True)
+    assert first_loaded.wait(5)
+    assert partial.resolve_name('Pikachu') == ('皮卡丘', ['电'])
+    assert partial.resolve_name('耿鬼') is None  # 尚未加载到
+    release.set()
+    assert partial._names_done.wait(5)
+    assert partial.resolve_name('耿鬼') == ('耿鬼', ['幽灵', '毒'])
+
+
+# --- 队伍对战矩阵 ---
+
+def test_matchup_grid_loads_chart(name_map_path):
+    fresh = te.TypeEngine(name_type_map_path=name_map_path)
+    assert fresh.matchup_grid([['火']], []) == [[]]
+    assert te.TypeEngine(name_type_map_path=name_map_path).matchup_grid([['火']], [['草']]) == [[2.0]]
+
+
+def test_team_matchup(engine):
+    result = engine.team_matchup(['皮卡丘', 'Charizard'], ['水箭龟', '不存在的宝可梦', '路卡利欧'])
+    assert [m['名称'] for m in result['队伍A']] == ['皮卡丘', '喷火龙']
+    assert [m['名称'] for m in result['队伍B']] == ['水箭龟', '路卡利欧']
+    types_a = [['电'], ['火', '飞行']]
+    types_b = [['水'], ['格斗', '钢']]
+    assert result['A攻B'] == reference_grid(types_a, types_b)
+    assert result['B攻A'] == reference_grid(types_b, types_a)
+    assert '不存在的宝可梦' in result['提示']
+
+
+def test_bracket_matchups(engine):
+    results = engine.bracket_matchups([
+        {'名称': '决赛', '队伍A': ['耿鬼'], '队伍B': ['超梦']},
+        {'队伍A': ['卡比兽'], '队伍B': ['耿鬼']},
+    ])
+    assert [r['名称'] for r in results] == ['决赛', '第2场']
+    assert results[0]['A攻B'] == reference_grid([['幽灵', '毒']], [['超能力']])
+    assert results[0]['B攻A'] == reference_grid([['超能力']], [['幽灵', '毒']])
+    assert results[1]['B攻A'] == reference_grid([['幽灵', '毒']], [['一般']])
+    for bad in ({'队伍A': ['耿鬼']}, {'队伍A': [1], '队伍B': ['皮卡丘']}, ['耿鬼']):
+        with pytest.raises(ValueError, match='第2项'):
+            engine.bracket_matchups([{'队伍A': ['耿鬼'], '队伍B': ['超梦']}, bad])
+
+
+# --- 环境（使用率）模拟 ---
+
+def _reference_metagame_score(team, opponent):
+    """我方全队对单个对手的得分：log2(最佳进攻倍率) - log2(对手对最佳换入成员的进攻倍率)"""
+    offense = max(reference_best(member, opponent) for member in team)
+    defense = min(reference_best(opponent, member) for member in team)
+    return (te.math.log2(max(offense, te.METAGAME_FLOOR))
+            - te.math.log2(max(defense, te.METAGAME_FLOOR)))
+
+
+def test_evaluate_metagame_matches_hand_computation(engine):
+    usage = {'超梦': 30, 'Gengar': 10, '不存在的宝可梦': 5, '卡比兽': 0}
+    result = engine.evaluate_metagame([['喷火龙', '水箭龟'], ['卡比兽']], usage)
+    assert '不存在的宝可梦' in result['提示']
+    team = [['火', '飞行'], ['水']]
+    scores = {'超能力': _reference_metagame_score(team, ['超能力']),
+              '幽灵': _reference_metagame_score(team, ['幽灵', '毒'])}
+    first = result['结果'][0]
+    assert first['期望得分'] == pytest.approx(0.75 * scores['超能力'] + 0.25 * scores['幽灵'])
+    assert first['最差得分'] == pytest.approx(min(scores.values()))
+    assert first['最差对手'] == (['超能力'] if scores['超能力'] <= scores['幽灵'] else ['幽灵', '毒'])
+
+
+def test_evaluate_metagame_sampling_is_reproducible(engine):
+    usage = {'超梦': 3, '耿鬼': 1, '皮卡丘': 2}
+    teams = [['喷火龙'], ['路卡利欧', '妙蛙种子']]
+    runs = [engine.evaluate_metagame(teams, usage, samples=200, seed=7) for _ in range(2)]
+    assert runs[0] == runs[1]
+    for item in runs[0]['结果']:
+        assert item['最差得分'] <= item['采样期望得分'] <= max(
+            _reference_metagame_score([engine.resolve_name(n)[1] for n in item['队伍']],
+                                      engine.resolve_name(o)[1]) for o in usage)
+        assert item['采样最差得分'] >= item['最差得分']
+    single = engine.evaluate_metagame(teams, {'耿鬼': 1}, samples=10, seed=1)['结果'][0]
+    assert single['采样期望得分'] == pytest.approx(single['期望得分'])
+
+
+@pytest.mark.parametrize('usage', [['耿鬼'], {'耿鬼': 'x'}, {'耿鬼': -1}, {'耿鬼': True},
+                                   {'耿鬼': float('nan')}])
+def test_evaluate_metagame_rejects_bad_usage(engine, usage):
+    with pytest.raises(ValueError, match='使用率格式错误'):
+        engine.evaluate_metagame([['皮卡丘']], usage)
+
+
+def test_evaluate_metagame_rejects_bad_teams(engine):
+    with pytest.raises(ValueError, match='候选队伍格式错误'):
+        engine.evaluate_metagame(['皮卡丘'], {'耿鬼': 1})
+
+
+# --- 常驻服务 ---
+
+@pytest.mark.parametrize('request_value', [['x'], 'x', 1, {'type': '火'}, {'name': [1]}, {}])
+def test_handle_request_rejects_malformed(engine, request_value):
+    with pytest.raises(ValueError):
+        te.handle_request(engine, request_value)
+
+
+@pytest.mark.skipif(not hasattr(te.socket, 'AF_UNIX'), reason='需要Unix套接字')
+def test_server_survives_idle_and_malformed_clients(engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(te._QueryHandler, 'timeout', 0.2)
+    path = str(tmp_path / 'q.sock')
+    server = te.socketserver.UnixStreamServer(path, te._QueryHandler)
+    server.engine = engine
+    thread = te.threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        idle = te.socket.socket(te.socket.AF_UNIX, te.socket.SOCK_STREAM)
+        idle.connect(path)  # 不发送任何数据
+        import type_query_client
+        start = time.perf_counter()
+        reply = json.loads(type_query_client.forward({'type': ['火']}, path))
+        assert time.perf_counter() - start < 5
+        assert reply['属性'] == ['火']
+        assert '错误' in json.loads(type_query_client.forward(['x'], path))
+        idle.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.skipif(not hasattr(te.socket, 'AF_UNIX'), reason='需要Unix套接字')
+def test_client_times_out_on_wedged_server(tmp_path):
+    import type_query_client
+    path = str(tmp_path / 'q.sock')
+    wedged = te.socket.socket(te.socket.AF_UNIX, te.socket.SOCK_STREAM)
+    wedged.bind(path)
+    wedged.listen(1)  # 接受连接但从不响应
+    try:
+        start = time.perf_counter()
+        assert type_query_client.forward({'type': ['火']}, path, timeout=0.2) is None
+        assert time.perf_counter() - start < 2
+        # 服务已在运行时拒绝重复启动
+        with pytest.raises(OSError, match='已在运行'):
+            te.serve(te.TypeEngine(), path)
+    finally:
+        wedged.close()
+
+
+def test_serve_keeps_non_socket_path(tmp_path):
+    path = tmp_path / 'notes.txt'
+    path.write_text('keep me', encoding='utf-8')
+    with pytest.raises(OSError, match='不是套接字文件'):
+        te.serve(te.TypeEngine(), str(path))
+    assert path.read_text(encoding='utf-8') == 'keep me'
+
+
+# --- 全量数据导出 ---
+
+def test_columnar_round_trip(tmp_path):
+    path = str(tmp_path / 't.tqcol')
+    columns = [('名称', 'str'), ('x', 'mult'), ('y', 'mult')]
+    groups = [[['皮卡丘', 0.0, 4.0], ['', 0.25, 1.0], ['Flabébé', 0.5, 2.0]], [['ピカチュウ', 1.0, 0.25]]]
+    writer = te.ColumnarWriter(path, columns)
+    for rows in groups:
+        writer.write_rows(rows)
+    writer.write_rows([])
+    writer.close()
+    assert list(te.read_columnar(path)) == [
+        {name: [row[i] for row in rows] for i, (name, _) in enumerate(columns)} for rows in groups]
+
+
+def test_export_tables_round_trip(tmp_path):
+    mapping = dict(NAME_TYPE_MAP, **{'怪': '???', '半怪': ['火', '???'], '无属性': []})
+    map_path = tmp_path / 'names.json'
+    map_path.write_text(json.dumps(mapping, ensure_ascii=False), encoding='utf-8')
+    exporter = te.TypeEngine(name_type_map_path=str(map_path))
+    out = tmp_path / 'out'
+    result = exporter.export_tables(str(out), chunk_rows=3)
+    assert result['未导出'] == ['怪', '半怪', '无属性'] and '怪' in result['提示']
+    assert len(result['文件']) == 4
+
+    expected = {'species_multipliers': [
+        [name, *te._combo_columns(combo), *vector] for name, combo, vector in exporter.iter_species_profiles()],
+        'type_combo_profiles': [[*te._combo_columns(combo), *vector]
+                                for combo, vector in exporter.iter_combo_profiles()]}
+    assert [row[0] for row in expected['species_multipliers']] == list(NAME_TYPE_MAP)
+    for table, rows in expected.items():
+        with open(out / f'{table}.csv', encoding='utf-8', newline='') as f:
+            header, *csv_rows = list(csv.reader(f))
+        assert header[-len(TYPES):] == TYPES
+        assert [r[:-len(TYPES)] + [float(v) for v in r[-len(TYPES):]] for r in csv_rows] == rows
+        columnar = {}
+        for group in te.read_columnar(str(out / f'{table}.tqcol')):
+            for name, values in group.items():
+                columnar.setdefault(name, []).extend(values)
+        assert list(columnar) == header
+        assert [list(r) for r in zip(*columnar.values())] == rows
+
+
+def test_write_table_removes_partial_files_on_error(tmp_path):
+    def rows():
+        yield ['a', 1.0]
+        yield ['b', 2.0]
+        raise RuntimeError('boom')
+
+    base = str(tmp_path / 't')
+    with pytest.raises(RuntimeError):
+        te._write_table(base, [('名称', 'str'), ('x', 'mult')], rows(), te.EXPORT_FORMATS, 1)
+    assert os.listdir(tmp_path) == []
+
+
+# --- 克制推荐 ---
+
+def _reference_counter_score(candidate, opponents):
+    """逐只宝可梦直接计算克制推荐得分"""
+    attack = sum(te.math.log2(max(reference_best(candidate, o), te.METAGAME_FLOOR)) for o in opponents)
+    guard = sum(te.math.log2(max(reference_best(o, candidate), te.METAGAME_FLOOR)) for o in opponents)
+    return (attack - guard) / len(opponents)
+
+
+def test_recommend_counters_matches_reference(engine):
+    opponents = ['耿鬼', '喷火龙']
+    result = engine.recommend_counters(opponents, top_k=len(NAME_TYPE_MAP))
+    targets = [engine.resolve_name(n)[1] for n in opponents]
+    names = [r['名称'] for r in result['推荐']]
+    assert '耿鬼' not in names and '喷火龙' not in names
+    scores = [r['得分'] for r in result['推荐']]
+    assert scores == sorted(scores, reverse=True)
+    for item in result['推荐']:
+        assert item['得分'] == pytest.approx(_reference_counter_score(item['属性'], targets))
+
+
+def test_recommend_counters_filters(engine):
+    result = engine.recommend_counters(['皮卡丘'], top_k=3, exclude_types=['地面', '草'],
+                                       allow=['Blastoise', '妙蛙种子', '超梦', 'Lucario'])
+    names = [r['名称'] for r in result['推荐']]
+    assert len(names) == 3
+    assert set(names) <= {'水箭龟', '超梦', '路卡利欧'}
+    assert engine.recommend_counters(['不存在的宝可梦'])['推荐'] == []
+
+
+def test_recommend_counters_reports_unknown_filters(engine):
+    result = engine.recommend_counters(['皮卡丘'], exclude_types=['冰x'], allow=['Nope', '水箭龟'])
+    assert [r['名称'] for r in result['推荐']] == ['水箭龟']
+    assert 'x' in result['提示'] and 'Nope' in result['提示']
+    assert engine.recommend_counters(['皮卡丘'], allow=['Nope'])['提示'] == '未找到候选宝可梦: Nope'
+
+
+def test_recommend_counters_skips_unresolved_species(tmp_path):
+    mapping = {'皮卡丘': ['电'], '地鼠': ['地面'], '假地鼠': ['地面', '???'], '三属性': ['地面', '草', '龙']}
+    path = tmp_path / 'names.json'
+    path.write_text(json.dumps(mapping, ensure_ascii=False), encoding='utf-8')
+    loaded = te.TypeEngine(name_type_map_path=str(path))
+    result = loaded.recommend_counters(['皮卡丘'], top_k=10)
+    assert [r['名称'] for r in result['推荐']] == ['地鼠']
+
+
+# --- 性能断言 ---
+
+def _best_of(runs, func):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def test_query_latency(engine):
+    engine.query_types(['火'])
+    engine.query_name('皮卡丘')
+    queries = [[t] for t in TYPES] + [list(c) for c in COMBOS[18:]]
+    names = list(NAME_TYPE_MAP) * 10
+
+    per_type_query = _best_of(3, lambda: [engine.query_types(q) for q in queries]) / len(queries)
+    per_name_query = _best_of(3, lambda: [engine.query_name(n) for n in names]) / len(names)
+    assert per_type_query * 1000 < MAX_QUERY_MS
+    assert per_name_query * 1000 < MAX_QUERY_MS
+
+
+@pytest.fixture(scope='module')
+def large_name_map_path(tmp_path_factory):
+    """含2万条记录的名称映射表，用于名称查询启动时间"""
+    combos = [list(c) for c in COMBOS]
+    mapping = {f'测试宝可梦{i}': {'属性': combos[i % len(combos)], '别名': [f'Test{i}']}
+               for i in range(20000)}
+    mapping.update(NAME_TYPE_MAP)
+    path = tmp_path_factory.mktemp('data') / 'large_name_type_map.json'
+    path.write_text(json.dumps(mapping, ensure_ascii=False), encoding='utf-8')
+    return str(path)
+
+
+@pytest.mark.parametrize('query', [['--type', '火'], ['--name', '皮卡丘']], ids=['type', 'name'])
+def test_cli_startup_time(query, large_name_map_path):
+    script = os.path.join(te.BASE_DIR, 'type_query_engine.py')
+    command = [sys.executable, script, *query, '--name_type_map', large_name_map_path]
+    elapsed = _best_of(3, lambda: subprocess.run(command, check=True, capture_output=True))
+    assert elapsed < MAX_STARTUP_S
@@ -10,6 +10,8 @@ import sys
 import json
 import argparse
 
+from type_query_engine import AliasAutomaton
+
 class TypeQueryApp:
     """
     宝可梦属性克制关系查询主类
@@ -388,7 +390,7 @@ POKEMON_TYPE_ALIASES = {
     '冰': ['冰', '冰系', 'ice', 'こおり'],
     '格斗': ['格斗', '格斗系', 'fight', 'fighting', 'かくとう'],
     '毒': ['毒', '毒系', 'poison', 'どく'],
-    '地面': ['地面', '地面系', 'ground', 'じめん'],
+    '地面': ['地面', '地面系', '地', 'ground', 'じめん'],
     '飞行': ['飞行', '飞行系', 'flying', 'ひこう'],
     '超能': ['超能', '超能力', '超能系', 'psychic', 'エスパー'],
     '虫': ['虫', '虫系', 'bug', 'むし'],
@@ -424,6 +426,66 @@ for std_name, aliases in POKEMON_NAME_ALIASES.items():
         NAME_ALIAS_TO_STANDARD[alias.lower()] = std_name
 
 
+def build_alias_automaton(alias_to_standard, kind):
+    """
+    由本模块的反向映射表构建多模式分词自动机，用于切分无分隔符或混合分隔符的组合输入。
+    标准名称与别名覆盖范围与反向映射表完全一致。
+    """
+    automaton = AliasAutomaton()
+    for alias, std in alias_to_standard.items():
+        automaton.add(alias, kind, std)
+    return automaton.build()
+
+
+TYPE_ALIAS_AUTOMATON = build_alias_automaton(TYPE_ALIAS_TO_STANDARD, '属性')
+NAME_ALIAS_AUTOMATON = build_alias_automaton(NAME_ALIAS_TO_STANDARD, '宝可梦')
+
+
+def _segment_alias_input(item, alias_to_standard, automaton, drop_suffix):
+    """
+    单项组合输入的标准化：先按整体查反向映射表（规则同 standardize_type_input/standardize_name_input），
+    未命中时再用自动机切分。
+    （本文件后续模块会重新定义同名的 standardize_* 函数，此处直接查本模块的映射表）
+    返回 (标准值列表, 未识别片段列表)
+    """
+    if not isinstance(item, str):
+        return [], [item]
+    clean = re.sub(r'[\s\-]', '', item).lower()
+    if drop_suffix:
+        clean = clean.replace('系', '')
+    std = alias_to_standard.get(clean)
+    if std:
+        return [std], []
+    stds, invalid = [], []
+    for token in automaton.tokenize(item):
+        if token['标准']:
+            stds.append(token['标准'])
+        else:
+            invalid.append(token['文本'])
+    return stds, invalid
+
+
+def _standardize_multi_input(inputs, alias_to_standard, automaton, drop_suffix, return_invalid):
+    """standardize_multi_type_input / standardize_multi_name_input 的共用实现"""
+    if isinstance(inputs, str):
+        items = [inputs]
+    elif isinstance(inputs, list):
+        items = inputs
+    else:
+        return ([], [inputs]) if return_invalid else []
+    result, invalid = [], []
+    for item in items:
+        stds, item_invalid = _segment_alias_input(item, alias_to_standard, automaton, drop_suffix)
+        invalid.extend(item_invalid)
+        for std in stds:
+            if std not in result:
+                result.append(std)
+    if return_invalid:
+        return result, invalid
+    # 存在未识别片段时不返回残缺的组合
+    return [] if invalid else result
+
+
 def standardize_type_input(type_input):
     """
     对属性输入进行标准化处理，支持多语言、别名、去除“系”、空格、大小写等。
@@ -450,43 +512,26 @@ def standardize_name_input(name_input):
     return NAME_ALIAS_TO_STANDARD.get(clean, None)
 
 
-def standardize_multi_type_input(type_inputs):
+def standardize_multi_type_input(type_inputs, return_invalid=False):
     """
     支持多属性组合输入，返回标准属性列表。
-    输入可以是字符串（逗号/空格分隔）或列表。
+    输入可以是字符串（任意分隔符或无分隔符，如“草/毒”“地龙”“火系fire”）或列表。
+    每项先按整体标准化，无法识别时再由属性别名自动机切分。
+    存在未识别片段时返回空列表；return_invalid=True 时返回 (标准属性列表, 未识别片段列表)。
     """
-    if isinstance(type_inputs, str):
-        # 支持逗号、空格分隔
-        items = re.split(r'[，,\s]+', type_inputs)
-    elif isinstance(type_inputs, list):
-        items = type_inputs
-    else:
-        return []
-    result = []
-    for item in items:
-        std = standardize_type_input(item)
-        if std and std not in result:
-            result.append(std)
-    return result
+    return _standardize_multi_input(type_inputs, TYPE_ALIAS_TO_STANDARD, TYPE_ALIAS_AUTOMATON,
+                                    True, return_invalid)
 
 
-def standardize_multi_name_input(name_inputs):
+def standardize_multi_name_input(name_inputs, return_invalid=False):
     """
     支持多宝可梦名称组合输入，返回标准名称列表。
-    输入可以是字符串（逗号/空格分隔）或列表。
+    输入可以是字符串（任意分隔符或无分隔符，如“皮卡丘/喷火龙”“皮卡丘喷火龙”）或列表。
+    每项先按整体标准化，无法识别时再由名称别名自动机切分。
+    存在未识别片段时返回空列表；return_invalid=True 时返回 (标准名称列表, 未识别片段列表)。
     """
-    if isinstance(name_inputs, str):
-        items = re.split(r'[，,\s]+', name_inputs)
-    elif isinstance(name_inputs, list):
-        items = name_inputs
-    else:
-        return []
-    result = []
-    for item in items:
-        std = standardize_name_input(item)
-        if std and std not in result:
-            result.append(std)
-    return result
+    return _standardize_multi_input(name_inputs, NAME_ALIAS_TO_STANDARD, NAME_ALIAS_AUTOMATON,
+                                    False, return_invalid)
 
 # --- 以上为输入标准化与容错处理模块，供后续查询逻辑调用 ---
 
@@ -494,8 +539,8 @@ def standardize_multi_name_input(name_inputs):
 用法说明：
 - standardize_type_input(type_input): 输入任意属性别名或多语言，返回标准属性名。
 - standardize_name_input(name_input): 输入任意宝可梦名称别名或多语言，返回标准名称。
-- standardize_multi_type_input(type_inputs): 输入多属性（字符串或列表），返回标准属性列表。
-- standardize_multi_name_input(name_inputs): 输入多宝可梦名称（字符串或列表），返回标准名称列表。
+- standardize_multi_type_input(type_inputs, return_invalid=False): 输入多属性（字符串或列表），返回标准属性列表；含未识别片段时返回空列表，return_invalid=True 时同时返回未识别片段。
+- standardize_multi_name_input(name_inputs, return_invalid=False): 输入多宝可梦名称（字符串或列表），返回标准名称列表；未识别片段的处理同上。
 """
 
 # type_query_app.py
@@ -0,0 +1,72 @@
+# type_query_client.py
+"""
+宝可梦属性克制关系查询轻量客户端
+- 将 --type/--name 查询转发给常驻服务（python type_query_engine.py --serve），直接打印返回结果
+- 仅依赖标准库中启动开销极小的模块，不导入argparse与查询引擎
+- 常驻服务未运行、超时未响应或参数不属于简单查询时，回退为进程内执行 type_query_engine 命令行
+
+用法：
+    python type_query_client.py --type 草 毒
+    python type_query_client.py --name 皮卡丘 Charizard
+"""
+import json
+import os
+import socket
+import sys
+
+SOCKET_PATH = os.environ.get('TYPE_QUERY_SOCKET') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '.type_query.sock')
+# 等待常驻服务响应的超时时间（秒），超时后回退为进程内执行
+TIMEOUT = 5.0
+
+
+def parse_request(argv):
+    """
+    解析简单查询参数：-t/--type 或 -n/--name 后跟一个或多个值
+    其他参数组合返回None，交由完整命令行处理
+    """
+    options = {'-t': 'type', '--type': 'type', '-n': 'name', '--name': 'name'}
+    if not argv or argv[0] not in options:
+        return None
+    key = options[argv[0]]
+    values = argv[1:]
+    if not values or any(v.startswith('-') for v in values):
+        return None
+    return {key: values}
+
+
+def forward(request, socket_path=SOCKET_PATH, timeout=TIMEOUT):
+    """将请求发送给常驻服务，返回结果文本；服务不可用或超时未响应时返回None"""
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        client.connect(socket_path)
+        client.sendall(json.dumps(request, ensure_ascii=False).encode('utf-8') + b'\n')
+        chunks = []
+        while True:
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    except OSError:
+        return None
+    finally:
+        client.close()
+    return b''.join(chunks).decode('utf-8') if chunks else None
+
+
+def main():
+    request = parse_request(sys.argv[1:])
+    output = forward(request) if request else None
+    if output is None:
+        # 回退：进程内执行完整命令行
+        import type_query_engine
+        type_query_engine.main()
+        return
+    sys.stdout.write(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1383 @@
+# type_query_engine.py
+"""
+宝可梦属性克制关系查询引擎
+- 惰性加载属性克制表与宝可梦名称映射，首次需要时才解析JSON
+- 将属性克制表编译为倍率矩阵，组合属性按倍率乘积计算防御关系
+- 可选的本地持久化结果缓存（SQLite），跨命令行进程复用名称解析与克制关系结果
+
+数据文件依赖：pokemon_type_chart.json、pokemon_name_type_map.json（默认与脚本同目录）
+"""
+import argparse
+import array
+import codecs
+import collections
+import csv
+import hashlib
+import heapq
+import itertools
+import json
+import math
+import os
+import random
+import re
+import socket
+import socketserver
+import sqlite3
+import stat
+import struct
+import sys
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# 数据文件路径（假定与脚本同目录）
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TYPE_CHART_PATH = os.path.join(BASE_DIR, 'pokemon_type_chart.json')
+NAME_TYPE_MAP_PATH = os.path.join(BASE_DIR, 'pokemon_name_type_map.json')
+CACHE_PATH = os.path.join(BASE_DIR, '.type_query_cache.sqlite3')
+# 缓存结果格式版本：解析或计算规则变化导致结果不同时递增，使旧缓存失效
+CACHE_VERSION = 1
+# 常驻服务的Unix套接字路径（可用环境变量TYPE_QUERY_SOCKET覆盖）
+SOCKET_PATH = os.environ.get('TYPE_QUERY_SOCKET') or os.path.join(BASE_DIR, '.type_query.sock')
+# 常驻服务读取单个请求的超时时间（秒），避免不发送数据的连接阻塞后续请求
+REQUEST_TIMEOUT = 5.0
+
+# 伤害倍率
+SUPER_EFFECTIVE = 2.0
+NOT_VERY_EFFECTIVE = 0.5
+NO_EFFECT = 0.0
+# 环境模拟得分计算时的倍率下限（避免免疫导致 log2(0)）
+METAGAME_FLOOR = 0.125
+
+# 全量导出格式、每块行数与列式文件标识
+EXPORT_FORMATS = ('csv', 'tqcol')
+EXPORT_CHUNK_ROWS = 8192
+TQCOL_MAGIC = b'TQCOL1'
+MULTIPLIER_SCALE = 4
+
+# 属性别名与多语言映射（主键与pokemon_type_chart.json中的“属性”字段一致）
+TYPE_ALIASES = {
+    '一般': ['一般', '普通', 'normal', 'ノーマル'],
+    '格斗': ['格斗', '格鬥', 'fight', 'fighting', 'かくとう'],
+    '飞行': ['飞行', '飛行', 'flying', 'ひこう'],
+    '毒': ['毒', 'poison', 'どく'],
+    '地面': ['地面', '地', 'ground', 'じめん'],
+    '岩石': ['岩石', '岩', 'rock', 'いわ'],
+    '虫': ['虫', '蟲', 'bug', 'むし'],
+    '幽灵': ['幽灵', '幽靈', 'ghost', 'ゴースト'],
+    '钢': ['钢', '鋼', 'steel', 'はがね'],
+    '火': ['火', '炎', 'fire', 'ほのお'],
+    '水': ['水', 'water', 'みず'],
+    '草': ['草', 'grass', 'くさ'],
+    '电': ['电', '電', '雷', 'electric', 'でんき'],
+    '超能力': ['超能力', '超能', 'psychic', 'エスパー'],
+    '冰': ['冰', 'ice', 'こおり'],
+    '龙': ['龙', '龍', 'dragon', 'ドラゴン'],
+    '恶': ['恶', '惡', 'dark', 'あく'],
+    '妖精': ['妖精', 'fairy', 'フェアリー'],
+}
+
+# 输入清理：去除空白、连字符、下划线
+_CLEAN_RE = re.compile(r'[\s\-_]+')
+
+
+def normalize_type_key(text: str) -> str:
+    """属性输入的标准化键：去除空白、“系”字，统一小写"""
+    return _CLEAN_RE.sub('', text).replace('系', '').lower()
+
+
+def normalize_name_key(text: str) -> str:
+    """宝可梦名称输入的标准化键：去除空白，统一小写"""
+    return _CLEAN_RE.sub('', text).lower()
+
+
+# 反向映射：标准化别名 -> 标准属性
+ALIAS_TO_TYPE = {}
+for _std_type, _aliases in TYPE_ALIASES.items():
+    for _alias in _aliases:
+        ALIAS_TO_TYPE[normalize_type_key(_alias)] = _std_type
+
+
+def _load_json(path: str) -> Any:
+    """加载JSON文件，文件不存在时抛出FileNotFoundError"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"找不到数据文件: {path}")
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _name_entry(name: str, value: Any) -> Tuple[str, List[str], List[str]]:
+    """
+    解析名称映射表中的一项，返回（名称, 属性列表, 别名列表）
+    支持两种取值写法：
+        "皮卡丘": ["电"] / "电"
+        "皮卡丘": {"属性": ["电"], "别名": ["Pikachu", "ピカチュウ"]}
+    :raises ValueError: 名称或取值不符合上述写法
+    """
+    types, aliases = value, []
+    if isinstance(value, dict):
+        types = value.get('属性', [])
+        aliases = value.get('别名', [])
+    if isinstance(types, str):
+        types = [types]
+    if not isinstance(name, str) or not all(
+            isinstance(v, list) and all(isinstance(s, str) for s in v) for v in (types, aliases)):
+        raise ValueError(f"名称映射表格式错误：{name!r} 的取值应为属性列表、属性字符串或"
+                         f"包含“属性”“别名”的对象，实际为 {value!r}")
+    return name, list(types), list(aliases)
+
+
+# --- 名称映射表流式加载 ---
+
+# 流式读取的块大小（字节）与进度回调间隔（记录数）
+STREAM_CHUNK_SIZE = 1 << 16
+PROGRESS_INTERVAL = 1000
+
+
+_WHITESPACE = re.compile(r'[ \t\r\n]*')
+
+
+class _JsonObjectStream:
+    """
+    JSON顶层对象的增量读取器：按块读取文件，逐个解析“键: 值”，
+    缓冲区只保留当前未解析的片段，峰值内存与单条记录大小相当而非整个文件
+    """
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, f, chunk_size: int = STREAM_CHUNK_SIZE):
+        self._file = f
+        self._chunk_size = chunk_size
+        self._utf8 = codecs.getincrementaldecoder('utf-8-sig')()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+        self.bytes_read = 0
+
+    def _fill(self) -> bool:
+        """读取下一块并丢弃已解析部分，已到文件结尾时返回False"""
+        if self._eof:
+            return False
+        chunk = self._file.read(self._chunk_size)
+        self.bytes_read += len(chunk)
+        self._eof = not chunk
+        self._buf = self._buf[self._pos:] + self._utf8.decode(chunk, final=self._eof)
+        self._pos = 0
+        return True
+
+    def _peek(self) -> Optional[str]:
+        """跳过空白，返回下一个字符（文件结尾返回None）"""
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return None
+
+    def _expect(self, chars: str) -> str:
+        ch = self._peek()
+        if ch is None or ch not in chars:
+            raise ValueError(f"名称映射表格式错误：期望 {chars!r}，实际为 {ch!r}")
+        self._pos += 1
+        return ch
+
+    def _value(self) -> Any:
+        """解析下一个完整的JSON值，数据不完整时继续读取"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # 位于缓冲区末尾的值（如数字）可能尚未读完
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """逐项产出顶层对象的（键, 值）"""
+        self._expect('{')
+        if self._peek() == '}':
+            return
+        while True:
+            key = self._value()
+            self._expect(':')
+            yield key, self._value()
+            if self._expect(',}') == '}':
+                return
+
+
+def iter_name_records(path: str,
+                      progress: Optional[Callable[[int, int, int], None]] = None,
+                      chunk_size: int = STREAM_CHUNK_SIZE
+                      ) -> Iterator[Tuple[str, List[str], List[str]]]:
+    """
+    流式读取名称映射表，逐条产出（名称, 属性列表, 别名列表）
+    - .json：与 pokemon_name_type_map.json 相同的顶层对象
+    - .jsonl：每行一条记录，{"名称": ..., "属性": [...], "别名": [...]}，
+      或每行一个与 .json 相同写法的小对象
+    :param progress: 进度回调 progress(已读记录数, 已读字节数, 文件总字节数)，
+                     每 PROGRESS_INTERVAL 条及读取结束时调用
+    :param chunk_size: .json 文件每次读取的字节数
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"找不到数据文件: {path}")
+    total = os.path.getsize(path)
+    count = 0
+    with open(path, 'rb') as f:
+        if path.endswith('.jsonl'):
+            def entries():
+                for line_no, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    record = json.loads(line.decode('utf-8-sig'))
+                    if not isinstance(record, dict):
+                        raise ValueError(f"名称映射表格式错误：第{line_no}行应为JSON对象")
+                    if '名称' in record:
+                        yield record['名称'], record
+                    else:
+                        yield from record.items()
+            stream = None
+            pairs = entries()
+        else:
+            stream = _JsonObjectStream(f, chunk_size)
+            pairs = stream.items()
+        for name, value in pairs:
+            # 进度在处理下一条记录前报告，读取结束时统一报告一次
+            if progress is not None and count and count % PROGRESS_INTERVAL == 0:
+                progress(count, stream.bytes_read if stream else f.tell(), total)
+            yield _name_entry(name, value)
+            count += 1
+    if progress is not None:
+        progress(count, total, total)
+
+
+# --- 复合输入分词（Aho-Corasick 多模式自动机） ---
+
+# 分隔字符：空白、常见标点及“系”后缀，分词时直接跳过
+TOKEN_SEPARATORS = frozenset(' \t\r\n　,，、/／+＋&＆|;；系')
+
+
+def _fold_char(ch: str) -> str:
+    """逐字符小写（保持长度不变，以便分词位置与原文一致）"""
+    lower = ch.lower()
+    return lower if len(lower) == 1 else ch
+
+
+def _is_ascii_word(ch: str) -> bool:
+    return ch.isascii() and ch.isalnum()
+
+
+class AliasAutomaton:
+    """
+    别名多模式匹配自动机（Aho-Corasick）
+    一次线性扫描找出文本中所有别名出现位置，按“最左最长、互不重叠”规则切分。
+    纯英文/数字别名要求两侧不是英文字母或数字，避免 "ice" 命中 "rice" 之类的误切分。
+    """
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # 每个结点：以该结点结尾的最长模式 (长度, 类别, 标准值)
+        self._output: List[Optional[Tuple[int, str, str]]] = [None]
+        self._built = False
+
+    def add(self, pattern: str, kind: str, value: str) -> None:
+        """添加模式，同一模式重复添加时保留先添加的结果"""
+        pattern = ''.join(_fold_char(ch) for ch in pattern)
+        if not pattern:
+            return
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(None)
+            node = nxt
+        if self._output[node] is None or self._output[node][0] != len(pattern):
+            self._output[node] = (len(pattern), kind, value)
+        self._built = False
+
+    def build(self) -> 'AliasAutomaton':
+        """广度优先计算失配指针，并把后缀结点上的最长模式向下传递"""
+        queue = list(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for ch, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                if self._output[child] is None:
+                    self._output[child] = self._output[self._fail[child]]
+                queue.append(child)
+        self._built = True
+        return self
+
+    def scan(self, text: str) -> List[Tuple[int, int, str, str]]:
+        """
+        扫描文本
+        :return: list[(起始位置, 结束位置, 类别, 标准值)]，按位置排序、互不重叠
+        """
+        if not self._built:
+            self.build()
+        goto, fail, output = self._goto, self._fail, self._output
+        candidates = []
+        node = 0
+        for end, ch in enumerate(text, 1):
+            ch = _fold_char(ch)
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            hit = output[node]
+            if hit is not None:
+                start = end - hit[0]
+                if _is_ascii_word(text[start]) and (
+                        (start > 0 and _is_ascii_word(text[start - 1]))
+                        or (end < len(text) and _is_ascii_word(text[end]))):
+                    continue
+                candidates.append((start, end, hit[1], hit[2]))
+        # 最左最长：起始位置优先，其次长度优先，跳过与已选结果重叠的候选
+        candidates.sort(key=lambda c: (c[0], c[0] - c[1]))
+        result, last_end = [], 0
+        for candidate in candidates:
+            if candidate[0] >= last_end:
+                result.append(candidate)
+                last_end = candidate[1]
+        return result
+
+    def tokenize(self, text: str) -> List[Dict[str, Any]]:
+        """
+        切分自由文本，返回带位置的标准化词元
+        词元结构：{'文本', '类别'（属性/宝可梦/未识别）, '标准', '位置': (起, 止)}
+        未命中任何别名的非分隔片段作为“未识别”词元返回
+        """
+        tokens = []
+
+        def add_unknown(start, end):
+            begin = None
+            for i in range(start, end + 1):
+                if i < end and text[i] not in TOKEN_SEPARATORS:
+                    if begin is None:
+                        begin = i
+                elif begin is not None:
+                    tokens.append({'文本': text[begin:i], '类别': '未识别', '标准': None, '位置': (begin, i)})
+                    begin = None
+
+        pos = 0
+        for start, end, kind, value in self.scan(text):
+            add_unknown(pos, start)
+            tokens.append({'文本': text[start:end], '类别': kind, '标准': value, '位置': (start, end)})
+            pos = end
+        add_unknown(pos, len(text))
+        return tokens
+
+
+def _add_type_patterns(automaton: AliasAutomaton) -> AliasAutomaton:
+    for alias, std_type in ALIAS_TO_TYPE.items():
+        automaton.add(alias, '属性', std_type)
+    return automaton
+
+
+_TYPE_AUTOMATON: Optional[AliasAutomaton] = None
+
+
+def type_automaton() -> AliasAutomaton:
+    """仅含属性别名的分词自动机（无需加载数据文件，首次使用时构建）"""
+    global _TYPE_AUTOMATON
+    if _TYPE_AUTOMATON is None:
+        _TYPE_AUTOMATON = _add_type_patterns(AliasAutomaton()).build()
+    return _TYPE_AUTOMATON
+
+
+def tokenize_types(text: str) -> List[Dict[str, Any]]:
+    """将属性组合输入（如“草/毒”“地龙”“火系 fire”）切分为带位置的标准化词元"""
+    if not isinstance(text, str):
+        return []
+    return type_automaton().tokenize(text)
+
+
+class TypeEngine:
+    """
+    属性克制关系查询引擎
+    - types：属性列表（顺序与属性克制表一致）
+    - matrix[攻击属性序号][防御属性序号]：单属性伤害倍率
+    数据在首次需要时加载；传入cache时，查询结果优先从持久化缓存读取
+    """
+    def __init__(self, type_chart_path: str = TYPE_CHART_PATH,
+                 name_type_map_path: str = NAME_TYPE_MAP_PATH,
+                 cache: Optional['ResultCache'] = None):
+        self.type_chart_path = type_chart_path
+        self.name_type_map_path = name_type_map_path
+        self.cache = cache
+        self.types: List[str] = []
+        self.type_index: Dict[str, int] = {}
+        self.matrix: List[List[float]] = []
+        # 属性克制表中同时列在“克制”和“被克制”里的（攻击属性, 防御属性）
+        self.chart_conflicts: List[Tuple[str, str]] = []
+        self._name_index: Optional[Dict[str, Tuple[str, Tuple[str, ...]]]] = None
+        self._names_done = threading.Event()
+        self._names_error: Optional[BaseException] = None
+        self._partial_queries = False
+        self._automaton: Optional[AliasAutomaton] = None
+        # 含空格、连字符等、与标准化键不同的原始名称/别名写法 -> 标准名称（供自由文本分词）
+        self._spelled_names: List[Tuple[str, str]] = []
+        # 名称映射表中属性无法完整识别、未写入索引的记录名称
+        self.skipped_names: List[str] = []
+        self._species_by_combo: Optional[Dict[Tuple[str, ...], List[str]]] = None
+
+    # --- 数据加载 ---
+
+    def _ensure_chart(self) -> None:
+        """加载属性克制表并编译为倍率矩阵"""
+        if self.matrix:
+            return
+        chart = _load_json(self.type_chart_path)
+        types = [item['属性'] for item in chart]
+        index = {t: i for i, t in enumerate(types)}
+        matrix, conflicts = [], []
+        for item in chart:
+            row = [1.0] * len(types)
+            # 同一属性同时出现在“克制”和“被克制”中时以“克制”为准，并记录在 chart_conflicts 中
+            for group, multiplier in (('被克制', NOT_VERY_EFFECTIVE),
+                                      ('克制', SUPER_EFFECTIVE),
+                                      ('无效', NO_EFFECT)):
+                for target in item.get(group, []):
+                    std = ALIAS_TO_TYPE.get(normalize_type_key(target), target)
+                    if std not in index:
+                        raise ValueError(f"属性克制表中存在未知属性: {target}")
+                    if group == '克制' and row[index[std]] == NOT_VERY_EFFECTIVE:
+                        conflicts.append((item['属性'], std))
+                    row[index[std]] = multiplier
+            matrix.append(row)
+        self.types, self.type_index, self.matrix = types, index, matrix
+        self.chart_conflicts = conflicts
+
+    def load_names(self, progress: Optional[Callable[[int, int, int], None]] = None,
+                   background: bool = False, partial: bool = False) -> None:
+        """
+        流式加载名称映射表，逐条写入名称索引；已开始加载时不重复加载
+        相同属性组合共用同一个元组，索引中只保存名称与组合引用
+        :param progress: 进度回调，见 iter_name_records
+        :param background: 是否在后台线程加载
+        :param partial: 后台加载期间是否允许按已加载部分回答查询（未加载到的名称暂按未找到处理）
+        属性无法完整识别的记录（见 species_combo）不写入索引，名称记录在 skipped_names 中
+        """
+        if self._name_index is not None:
+            return
+        self._name_index = {}
+        self._partial_queries = partial
+        if background:
+            threading.Thread(target=self._load_names_into, args=(progress,), daemon=True).start()
+        else:
+            self._load_names_into(progress)
+
+    def _load_names_into(self, progress: Optional[Callable[[int, int, int], None]]) -> None:
+        index = self._name_index
+        # 原始属性写法 -> 共享的标准属性组合元组（无法识别时为空元组）
+        combos: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+        try:
+            for name, types, aliases in iter_name_records(self.name_type_map_path, progress):
+                raw = tuple(types)
+                std_types = combos.get(raw)
+                if std_types is None:
+                    std_types = self.species_combo(types) or ()
+                    std_types = combos[raw] = next((c for c in combos.values() if c == std_types), std_types)
+                if not std_types:
+                    self.skipped_names.append(name)
+                    continue
+                entry = (name, std_types)
+                for alias in [name] + aliases:
+                    key = normalize_name_key(alias)
+                    if index.setdefault(key, entry) is entry and alias.lower() != key:
+                        self._spelled_names.append((alias, name))
+        except BaseException as e:
+            self._names_error = e
+            raise
+        finally:
+            self._names_done.set()
+
+    def _ensure_names(self) -> Dict[str, Tuple[str, Tuple[str, ...]]]:
+        """返回完整的 标准化名称/别名 -> (标准名称, 属性) 索引，必要时加载或等待后台加载完成"""
+        if self._name_index is None:
+            self.load_names()
+        self._names_done.wait()
+        if self._names_error is not None:
+            raise self._names_error
+        return self._name_index
+
+    # --- 输入标准化 ---
+
+    def resolve_type(self, text: str) -> Optional[str]:
+        """将属性输入（别名、多语言、带“系”）解析为标准属性，无法识别返回None"""
+        if not isinstance(text, str):
+            return None
+        return ALIAS_TO_TYPE.get(normalize_type_key(text))
+
+    def standardize_types(self, inputs: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        批量解析属性输入，单个输入可包含多个属性（如“草/毒”“地龙”）
+        :return: (去重后的标准属性列表, 无法识别的输入片段列表)
+        """
+        std_types, invalid = [], []
+        for text in inputs:
+            std = self.resolve_type(text)
+            if std is not None:
+                tokens = [{'类别': '属性', '标准': std}]
+            elif isinstance(text, str) and not text.strip():
+                continue
+            else:
+                tokens = tokenize_types(text) or [{'类别': '未识别', '文本': text}]
+            for token in tokens:
+                if token['类别'] != '属性':
+                    invalid.append(token['文本'])
+                elif token['标准'] not in std_types:
+                    std_types.append(token['标准'])
+        return std_types, invalid
+
+    def species_combo(self, types: List[str]) -> Optional[Tuple[str, ...]]:
+        """
+        名称映射表中一条记录的标准属性组合
+        含未识别片段、为空或超过两种属性时返回None（该记录不写入索引、不导出）
+        """
+        std_types, invalid = self.standardize_types(types)
+        if invalid or not 1 <= len(std_types) <= 2:
+            return None
+        return tuple(std_types)
+
+    def tokenize(self, text: str) -> List[Dict[str, Any]]:
+        """
+        将自由文本（混合语言、无分隔符、带“系”后缀）一次切分为属性与宝可梦名称词元
+        词元结构见 AliasAutomaton.tokenize，宝可梦词元的“标准”为标准名称
+        名称同时按标准化键（如“tapukoko”）和原始写法（如“Tapu Koko”“Ho-Oh”）匹配
+        """
+        if self._automaton is None:
+            automaton = AliasAutomaton()
+            for key, (name, _) in self._ensure_names().items():
+                automaton.add(key, '宝可梦', name)
+            for alias, name in self._spelled_names:
+                automaton.add(alias, '宝可梦', name)
+            self._automaton = _add_type_patterns(automaton).build()
+        return self._automaton.tokenize(text)
+
+    def resolve_name(self, name: str) -> Optional[Tuple[str, List[str]]]:
+        """
+        将宝可梦名称（中/英/日文、别名）解析为（标准名称, 属性列表）
+        未找到返回None；启用缓存时解析结果写入持久化缓存
+        """
+        key = normalize_name_key(name)
+        if self.cache is not None:
+            hit = self.cache.get('name', key)
+            if hit is not None:
+                return (hit[0], hit[1]) if hit else None
+        if self._partial_queries and not self._names_done.is_set():
+            entry = self._name_index.get(key)
+            if entry is None:
+                # 尚未加载到该名称，不写入缓存
+                return None
+        else:
+            entry = self._ensure_names().get(key)
+        resolved = (entry[0], list(entry[1])) if entry else None
+        if self.cache is not None:
+            self.cache.put('name', key, list(resolved) if resolved else [])
+        return resolved
+
+    # --- 克制关系计算 ---
+
+    def defense_multipliers(self, types: List[str]) -> List[float]:
+        """组合属性的防御倍率（按攻击属性顺序），各属性倍率相乘"""
+        self._ensure_chart()
+        columns = [self.type_index[t] for t in types]
+        result = []
+        for row in self.matrix:
+            multiplier = 1.0
+            for col in columns:
+                multiplier *= row[col]
+            result.append(multiplier)
+        return result
+
+    def relations(self, types: List[str]) -> Dict[str, Any]:
+        """
+        计算标准属性组合的分组克制关系
+        - 克制/被克制/无效：以本属性攻击时效果拔群/减半/无效的属性（多属性取并集）
+        - 被克制于/抵抗/免疫：本属性组合被攻击时倍率>1 / <1 / =0 的属性
+        - 倍率：各攻击属性对本属性组合的防御倍率
+        """
+        key = '+'.join(types)
+        if self.cache is not None:
+            hit = self.cache.get('relations', key)
+            if hit is not None:
+                return hit
+        self._ensure_chart()
+        offense = {'克制': [], '被克制': [], '无效': []}
+        for target, col in self.type_index.items():
+            values = [self.matrix[self.type_index[t]][col] for t in types]
+            if SUPER_EFFECTIVE in values:
+                offense['克制'].append(target)
+            if NOT_VERY_EFFECTIVE in values:
+                offense['被克制'].append(target)
+            if NO_EFFECT in values:
+                offense['无效'].append(target)
+        multipliers = self.defense_multipliers(types)
+        result = dict(offense)
+        result['被克制于'] = [t for t, m in zip(self.types, multipliers) if m > 1]
+        result['抵抗'] = [t for t, m in zip(self.types, multipliers) if 0 < m < 1]
+        result['免疫'] = [t for t, m in zip(self.types, multipliers) if m == 0]
+        result['倍率'] = dict(zip(self.types, multipliers))
+        if self.cache is not None:
+            self.cache.put('relations', key, result)
+        return result
+
+    # --- 查询接口 ---
+
+    def query_types(self, inputs: List[str]) -> Dict[str, Any]:
+        """
+        按属性查询克制关系，多属性自动组合
+        :param inputs: list[str]，属性名称列表（支持别名、多语言）
+        :return: dict，包含输入、标准属性、分组结果和容错提示
+        """
+        std_types, invalid = self.standardize_types(inputs)
+        tip = f"未识别的属性: {'、'.join(invalid)}" if invalid else ''
+        return {
+            '输入': inputs,
+            '属性': std_types,
+            '结果': self.relations(std_types) if std_types else None,
+            '提示': tip if std_types else (tip or '输入不能为空或未识别'),
+        }
+
+    def query_name(self, name: str) -> Dict[str, Any]:
+        """
+        按宝可梦名称查询属性及克制关系
+        :param name: str，宝可梦名称（支持多语言、别名）
+        :return: dict，结构与 query_pokemon_by_name 一致
+        """
+        resolved = self.resolve_name(name)
+        if not resolved:
+            return {
+                '名称': name,
+                '属性': [],
+                '结果': None,
+                '提示': '未找到该宝可梦名称或属性信息，请检查输入是否正确。'
+            }
+        return {
+            '名称': resolved[0],
+            '属性': resolved[1],
+            '结果': self.relations(resolved[1]) if resolved[1] else None,
+            '提示': ''
+        }
+
+    # --- 队伍对战矩阵 ---
+
+    def resolve_team(self, names: List[str]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        解析队伍成员
+        :return: (成员列表[{'名称', '属性'}], 未找到的名称列表)
+        """
+        members, missing = [], []
+        for name in names:
+            resolved = self.resolve_name(name)
+            if resolved and resolved[1]:
+                members.append({'名称': resolved[0], '属性': resolved[1]})
+            else:
+                missing.append(name)
+        return members, missing
+
+    def matchup_grid(self, attackers: List[List[str]], defenders: List[List[str]],
+                     vectors: Optional[Dict[Tuple[str, ...], List[float]]] = None) -> List[List[float]]:
+        """
+        计算攻击方×防御方的最佳倍率矩阵
+        grid[i][j] = 攻击方第i个成员的本系属性对防御方第j个成员属性组合的最大倍率
+        :param vectors: 属性组合 -> 防御倍率向量 的复用表，相同组合只计算一次
+        """
+        self._ensure_chart()
+        if vectors is None:
+            vectors = {}
+        columns = []
+        for types in defenders:
+            combo = tuple(types)
+            if combo not in vectors:
+                vectors[combo] = self.defense_multipliers(types)
+            columns.append(vectors[combo])
+        rows = [[self.type_index[t] for t in types] for types in attackers]
+        return [[max(column[i] for i in row) for column in columns] for row in rows]
+
+    def team_matchup(self, team_a: List[str], team_b: List[str],
+                     vectors: Optional[Dict[Tuple[str, ...], List[float]]] = None) -> Dict[str, Any]:
+        """
+        队伍对战矩阵查询（N×M）
+        :param team_a: list[str]，队伍A成员名称
+        :param team_b: list[str]，队伍B成员名称
+        :return: dict，包含双方成员属性、A攻B与B攻A的最佳倍率矩阵及未找到成员提示
+        """
+        self._ensure_chart()
+        members_a, missing_a = self.resolve_team(team_a)
+        members_b, missing_b = self.resolve_team(team_b)
+        types_a = [m['属性'] for m in members_a]
+        types_b = [m['属性'] for m in members_b]
+        if vectors is None:
+            vectors = {}
+        missing = missing_a + missing_b
+        return {
+            '队伍A': members_a,
+            '队伍B': members_b,
+            'A攻B': self.matchup_grid(types_a, types_b, vectors),
+            'B攻A': self.matchup_grid(types_b, types_a, vectors),
+            '提示': f"未找到宝可梦: {'、'.join(missing)}" if missing else ''
+        }
+
+    def bracket_matchups(self, matches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        批量计算赛程中每场对战的队伍矩阵，所有场次共享名称解析与防御倍率结果
+        :param matches: list[dict]，每项包含 '队伍A'、'队伍B'，可选 '名称'
+        :raises ValueError: 赛程格式错误时指明出错的场次
+        """
+        if not isinstance(matches, list):
+            raise ValueError('赛程格式错误：应为对战列表')
+        for i, match in enumerate(matches, 1):
+            if not isinstance(match, dict) or not all(
+                    isinstance(match.get(k), list) and all(isinstance(n, str) for n in match[k])
+                    for k in ('队伍A', '队伍B')):
+                raise ValueError(f"赛程第{i}项格式错误：需包含“队伍A”“队伍B”成员名称列表")
+        vectors = {}
+        results = []
+        for i, match in enumerate(matches, 1):
+            result = {'名称': match.get('名称', f'第{i}场')}
+            result.update(self.team_matchup(match['队伍A'], match['队伍B'], vectors))
+            results.append(result)
+        return results
+
+    # --- 环境（使用率）模拟 ---
+
+    def metagame_profile(self, usage: Dict[str, float]) -> Dict[str, Any]:
+        """
+        将使用率分布按属性组合汇总
+        :param usage: dict，宝可梦名称 -> 使用率（百分比或任意非负权重）
+        :return: {'组合': [属性组合元组], '权重': [归一化权重], '未找到': [名称]}
+        :raises ValueError: 使用率不是“名称 -> 非负数”的对象
+        """
+        if not isinstance(usage, dict):
+            raise ValueError('使用率格式错误：应为JSON对象（宝可梦名称 -> 使用率）')
+        for name, weight in usage.items():
+            if isinstance(weight, bool) or not isinstance(weight, (int, float)) \
+                    or not math.isfinite(weight) or weight < 0:
+                raise ValueError(f"使用率格式错误：{name!r} 的使用率应为非负数，实际为 {weight!r}")
+        weights: Dict[Tuple[str, ...], float] = {}
+        missing = []
+        for name, weight in usage.items():
+            resolved = self.resolve_name(name)
+            if not resolved or not resolved[1]:
+                missing.append(name)
+            elif weight > 0:
+                combo = tuple(resolved[1])
+                weights[combo] = weights.get(combo, 0.0) + weight
+        total = sum(weights.values())
+        return {
+            '组合': list(weights),
+            '权重': [w / total for w in weights.values()] if total else [],
+            '未找到': missing,
+        }
+
+    def evaluate_metagame(self, teams: List[List[str]], usage: Dict[str, float],
+                          samples: int = 0, seed: Optional[int] = None) -> Dict[str, Any]:
+        """
+        评估候选队伍在给定使用率环境下的对局得分
+        单个对手的得分 = log2(我方最佳进攻倍率) - log2(对手对我方最佳换入成员的最佳进攻倍率)，
+        倍率低于 METAGAME_FLOOR 按 METAGAME_FLOOR 计，0 表示势均力敌。
+        对手按属性组合汇总；每种成员属性组合对全部对手组合的得分向量只计算一次，
+        队伍得分由成员向量逐项取最大（进攻）/最小（防守）合成，供全部候选队伍复用。
+        :param teams: list[list[str]]，候选队伍（成员名称列表）
+        :param usage: dict，宝可梦名称 -> 使用率
+        :param samples: 大于0时额外按使用率随机抽取该数量的对手（蒙特卡洛）
+        :param seed: 随机种子
+        :return: {'结果': [每支队伍的期望得分、最差得分、最差对手属性等], '提示': str}
+        :raises ValueError: 候选队伍或使用率格式错误
+        """
+        if not isinstance(teams, list) or not all(
+                isinstance(team, list) and all(isinstance(n, str) for n in team) for team in teams):
+            raise ValueError('候选队伍格式错误：应为成员名称列表的列表')
+        self._ensure_chart()
+        profile = self.metagame_profile(usage)
+        combos, weights = profile['组合'], profile['权重']
+        sampled = []
+        if samples > 0 and combos:
+            rng = random.Random(seed)
+            # 抽样结果按组合计数，得分只需按次数加权
+            draws = rng.choices(range(len(combos)), weights=weights, k=samples)
+            sampled = sorted(collections.Counter(draws).items())
+        vectors: Dict[Tuple[str, ...], List[float]] = {}
+        # 成员属性组合 -> (对全部对手组合的进攻log2倍率向量, 全部对手组合对其的进攻log2倍率向量)
+        member_vectors: Dict[Tuple[str, ...], Tuple[List[float], List[float]]] = {}
+
+        def log_vectors(member):
+            if member not in member_vectors:
+                opponents = [list(c) for c in combos]
+                offense = self.matchup_grid([list(member)], opponents, vectors)[0]
+                defense = [row[0] for row in self.matchup_grid(opponents, [list(member)], vectors)]
+                member_vectors[member] = (
+                    [math.log2(max(m, METAGAME_FLOOR)) for m in offense],
+                    [math.log2(max(m, METAGAME_FLOOR)) for m in defense],
+                )
+            return member_vectors[member]
+
+        results, missing = [], list(profile['未找到'])
+        for team in teams:
+            members, team_missing = self.resolve_team(team)
+            missing.extend(team_missing)
+            member_combos = list({tuple(m['属性']): None for m in members})
+            if not member_combos or not combos:
+                results.append({'队伍': team, '期望得分': None, '最差得分': None, '最差对手': None})
+                continue
+            pairs = [log_vectors(m) for m in member_combos]
+            offense = list(map(max, *(p[0] for p in pairs))) if len(pairs) > 1 else pairs[0][0]
+            defense = list(map(min, *(p[1] for p in pairs))) if len(pairs) > 1 else pairs[0][1]
+            scores = [o - d for o, d in zip(offense, defense)]
+            worst = min(range(len(combos)), key=scores.__getitem__)
+            result = {
+                '队伍': team,
+                '期望得分': sum(w * s for w, s in zip(weights, scores)),
+                '最差得分': scores[worst],
+                '最差对手': list(combos[worst]),
+            }
+            if sampled:
+                result['采样期望得分'] = sum(scores[i] * n for i, n in sampled) / samples
+                result['采样最差得分'] = min(scores[i] for i, _ in sampled)
+            results.append(result)
+        missing = list(dict.fromkeys(missing))
+        return {
+            '结果': results,
+            '提示': f"未找到宝可梦: {'、'.join(missing)}" if missing else ''
+        }
+
+    # --- 克制推荐 ---
+
+    def species_by_combo(self) -> Dict[Tuple[str, ...], List[str]]:
+        """
+        属性组合 -> 该组合的宝可梦标准名称列表（由名称索引去重生成，首次使用时建立）
+        名称索引只收录属性可完整识别的记录（见 species_combo），组合均为一或两种标准属性
+        """
+        if self._species_by_combo is None:
+            groups: Dict[Tuple[str, ...], Dict[str, None]] = {}
+            for name, combo in self._ensure_names().values():
+                if combo:
+                    groups.setdefault(combo, {})[name] = None
+            self._species_by_combo = {combo: list(names) for combo, names in groups.items()}
+        return self._species_by_combo
+
+    def recommend_counters(self, opponents: List[str], top_k: int = 10,
+                           exclude_types: Optional[List[str]] = None,
+                           allow: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        针对对手宝可梦（单只或整队）推荐克制者
+        先按属性组合打分（每种组合只计算一次），再经索引展开为宝可梦，用堆取前 top_k 名。
+        得分 = 进攻 - 防守，均为对各对手取平均的 log2 倍率（算法同 evaluate_metagame）：
+        - 进攻：候选本系属性对对手的最佳倍率
+        - 防守：对手本系属性对候选的最佳倍率（越低越好）
+        :param opponents: list[str]，对手宝可梦名称
+        :param top_k: 返回数量
+        :param exclude_types: 排除含有这些属性的候选
+        :param allow: 只在这些宝可梦中推荐（名称支持别名）
+        :return: {'对手': [...], '推荐': [{'名称', '属性', '得分', '进攻', '防守'}], '提示': str}
+                 未找到的对手、无法识别的排除属性与候选名称均在“提示”中列出
+        """
+        self._ensure_chart()
+        members, missing = self.resolve_team(opponents)
+        result = {'对手': members, '推荐': [], '提示': ''}
+        hints = []
+        if missing:
+            hints.append(f"未找到宝可梦: {'、'.join(missing)}")
+        excluded_types, invalid_types = self.standardize_types(exclude_types or [])
+        if invalid_types:
+            hints.append(f"未识别的排除属性: {'、'.join(invalid_types)}")
+        allowed = None
+        if allow is not None:
+            allowed, unknown = set(), []
+            for name in allow:
+                resolved = self.resolve_name(name)
+                if resolved:
+                    allowed.add(resolved[0])
+                else:
+                    unknown.append(name)
+            if unknown:
+                hints.append(f"未找到候选宝可梦: {'、'.join(unknown)}")
+        result['提示'] = '；'.join(hints)
+        if not members:
+            return result
+        excluded = set(excluded_types)
+        taken = {m['名称'] for m in members}
+        candidates = [c for c in self.species_by_combo() if not excluded.intersection(c)]
+        if not candidates:
+            return result
+
+        vectors: Dict[Tuple[str, ...], List[float]] = {}
+        targets = [m['属性'] for m in members]
+        offense = self.matchup_grid([list(c) for c in candidates], targets, vectors)
+        defense = self.matchup_grid(targets, [list(c) for c in candidates], vectors)
+        n = len(targets)
+        heap = []
+        for i, combo in enumerate(candidates):
+            attack = sum(math.log2(max(m, METAGAME_FLOOR)) for m in offense[i]) / n
+            guard = sum(math.log2(max(row[i], METAGAME_FLOOR)) for row in defense) / n
+            heap.append((guard - attack, i, attack, guard))
+        heapq.heapify(heap)
+
+        species = self.species_by_combo()
+        while heap and len(result['推荐']) < top_k:
+            _, i, attack, guard = heapq.heappop(heap)
+            for name in species[candidates[i]]:
+                if name in taken or (allowed is not None and name not in allowed):
+                    continue
+                result['推荐'].append({
+                    '名称': name,
+                    '属性': list(candidates[i]),
+                    '得分': attack - guard,
+                    '进攻': attack,
+                    '防守': guard,
+                })
+                if len(result['推荐']) >= top_k:
+                    break
+        return result
+
+    # --- 全量数据导出 ---
+
+    def iter_combo_profiles(self) -> Iterator[Tuple[Tuple[str, ...], List[float]]]:
+        """按属性克制表顺序产出全部单属性及双属性组合（18种属性共171种）及其防御倍率向量"""
+        self._ensure_chart()
+        for i, first in enumerate(self.types):
+            yield (first,), self.defense_multipliers([first])
+            for second in self.types[i + 1:]:
+                yield (first, second), self.defense_multipliers([first, second])
+
+    def iter_species_profiles(self, progress: Optional[Callable[[int, int, int], None]] = None,
+                              on_skip: Optional[Callable[[str, List[str]], None]] = None
+                              ) -> Iterator[Tuple[str, Tuple[str, ...], List[float]]]:
+        """
+        流式产出名称映射表中每个宝可梦的（名称, 标准属性, 防御倍率向量）
+        直接读取数据文件而不建立名称索引，相同属性组合的倍率向量只计算一次
+        :param on_skip: 属性无法完整识别（含未识别片段、为空或超过两种）的宝可梦不产出，
+                        改为回调 on_skip(名称, 原始属性)
+        """
+        self._ensure_chart()
+        vectors: Dict[Tuple[str, ...], List[float]] = {}
+        for name, types, _ in iter_name_records(self.name_type_map_path, progress):
+            combo = self.species_combo(types)
+            if combo is None:
+                if on_skip is not None:
+                    on_skip(name, types)
+                continue
+            if combo not in vectors:
+                vectors[combo] = self.defense_multipliers(list(combo))
+            yield name, combo, vectors[combo]
+
+    def export_tables(self, out_dir: str, formats: Tuple[str, ...] = EXPORT_FORMATS,
+                      chunk_rows: int = EXPORT_CHUNK_ROWS,
+                      progress: Optional[Callable[[int, int, int], None]] = None) -> Dict[str, Any]:
+        """
+        导出全量克制数据表，按块写出，内存占用与数据量无关
+        - species_multipliers：宝可梦 × 攻击属性 倍率表（名称, 属性1, 属性2, 各攻击属性倍率）
+        - type_combo_profiles：属性组合 × 攻击属性 倍率表（属性1, 属性2, 各攻击属性倍率）
+        属性无法识别的宝可梦不导出，在结果中列出
+        :param formats: 'csv' 和/或 'tqcol'（列式二进制，见 ColumnarWriter）
+        :return: {'文件': [写出的文件路径], '未导出': [名称], '提示': str}
+        """
+        self._ensure_chart()
+        os.makedirs(out_dir, exist_ok=True)
+        written, skipped = [], []
+        species_rows = ([name] + _combo_columns(combo) + vector
+                        for name, combo, vector in self.iter_species_profiles(
+                            progress, lambda name, types: skipped.append(name)))
+        combo_rows = (_combo_columns(combo) + vector for combo, vector in self.iter_combo_profiles())
+        for table, key_columns, rows in (('species_multipliers', ['名称', '属性1', '属性2'], species_rows),
+                                         ('type_combo_profiles', ['属性1', '属性2'], combo_rows)):
+            columns = [(c, 'str') for c in key_columns] + [(t, 'mult') for t in self.types]
+            written.extend(_write_table(os.path.join(out_dir, table), columns, rows, formats, chunk_rows))
+        return {
+            '文件': written,
+            '未导出': skipped,
+            '提示': f"属性无法识别，未导出: {'、'.join(skipped)}" if skipped else ''
+        }
+
+
+# --- 列式导出格式 ---
+
+def _combo_columns(combo: Tuple[str, ...]) -> List[str]:
+    """属性组合展开为（属性1, 属性2）两列，单属性时属性2为空字符串"""
+    return [combo[0] if combo else '', combo[1] if len(combo) > 1 else '']
+
+
+class ColumnarWriter:
+    """
+    紧凑列式二进制文件写出器（.tqcol）
+    文件结构：TQCOL_MAGIC | 行组1 | 行组2 | ... | 尾部JSON | 尾部长度(uint32小端) | TQCOL_MAGIC
+    - 每个行组内各列连续存放：str 列为 uint32 字节长度数组（小端）+ UTF-8 数据，
+      mult 列为 倍率×4 的 uint8 数组（倍率均为0.25的整数倍，0~4倍可无损表示）
+    - 尾部JSON记录列定义及每个行组的行数和各列 (偏移, 字节数)，读取时可按列、按行组定位
+    """
+    def __init__(self, path: str, columns: List[Tuple[str, str]]):
+        self.columns = columns
+        self._file = open(path, 'wb')
+        self._file.write(TQCOL_MAGIC)
+        self._row_groups = []
+
+    def write_rows(self, rows: List[List[Any]]) -> None:
+        """写出一个行组"""
+        if not rows:
+            return
+        blocks = []
+        for i, (_, kind) in enumerate(self.columns):
+            values = [row[i] for row in rows]
+            if kind == 'str':
+                encoded = [v.encode('utf-8') for v in values]
+                block = _le_bytes(array.array('I', map(len, encoded))) + b''.join(encoded)
+            else:
+                block = bytes(int(v * MULTIPLIER_SCALE) for v in values)
+            blocks.append((self._file.tell(), len(block)))
+            self._file.write(block)
+        self._row_groups.append({'rows': len(rows), 'columns': blocks})
+
+    def abort(self) -> None:
+        """放弃写出：关闭并删除未完成的文件（不写尾部，避免产生看似有效的截断文件）"""
+        self._file.close()
+        os.remove(self._file.name)
+
+    def close(self) -> None:
+        footer = json.dumps({'columns': self.columns, 'row_groups': self._row_groups},
+                            ensure_ascii=False).encode('utf-8')
+        self._file.write(footer + struct.pack('<I', len(footer)) + TQCOL_MAGIC)
+        self._file.close()
+
+
+def _le_bytes(values: 'array.array') -> bytes:
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+
+def read_columnar(path: str) -> Iterator[Dict[str, List[Any]]]:
+    """
+    读取 .tqcol 文件，逐个行组产出 {列名: 值列表}
+    """
+    with open(path, 'rb') as f:
+        f.seek(-(len(TQCOL_MAGIC) + 4), os.SEEK_END)
+        size = struct.unpack('<I', f.read(4))[0]
+        if f.read() != TQCOL_MAGIC:
+            raise ValueError(f"不是有效的列式导出文件: {path}")
+        f.seek(-(len(TQCOL_MAGIC) + 4 + size), os.SEEK_END)
+        footer = json.loads(f.read(size).decode('utf-8'))
+        for group in footer['row_groups']:
+            data = {}
+            for (name, kind), (offset, nbytes) in zip(footer['columns'], group['columns']):
+                f.seek(offset)
+                block = f.read(nbytes)
+                if kind == 'str':
+                    lengths = array.array('I')
+                    lengths.frombytes(block[:4 * group['rows']])
+                    if sys.byteorder == 'big':
+                        lengths.byteswap()
+                    values, pos = [], 4 * group['rows']
+                    for length in lengths:
+                        values.append(block[pos:pos + length].decode('utf-8'))
+                        pos += length
+                else:
+                    values = [b / MULTIPLIER_SCALE for b in block]
+                data[name] = values
+            yield data
+
+
+def _write_table(base_path: str, columns: List[Tuple[str, str]], rows: Iterator[List[Any]],
+                 formats: Tuple[str, ...], chunk_rows: int) -> List[str]:
+    """
+    按块将行写入 CSV 和/或列式文件，返回写出的文件路径
+    行数据产出过程中出错时删除已写出的部分文件并重新抛出异常
+    """
+    paths, csv_file, csv_writer, col_writer = [], None, None, None
+    if 'csv' in formats:
+        paths.append(base_path + '.csv')
+        csv_file = open(paths[-1], 'w', encoding='utf-8', newline='')
+        csv_writer = csv.writer(csv_file)
+        csv_writer.writerow([name for name, _ in columns])
+    if 'tqcol' in formats:
+        paths.append(base_path + '.tqcol')
+        col_writer = ColumnarWriter(paths[-1], columns)
+    try:
+        chunk = list(itertools.islice(rows, chunk_rows))
+        while chunk:
+            if csv_writer is not None:
+                csv_writer.writerows([[_format_cell(v) for v in row] for row in chunk])
+            if col_writer is not None:
+                col_writer.write_rows(chunk)
+            chunk = list(itertools.islice(rows, chunk_rows))
+    except BaseException:
+        if csv_file is not None:
+            csv_file.close()
+            os.remove(csv_file.name)
+        if col_writer is not None:
+            col_writer.abort()
+        raise
+    if csv_file is not None:
+        csv_file.close()
+    if col_writer is not None:
+        col_writer.close()
+    return paths
+
+
+def _format_cell(value: Any) -> Any:
+    """CSV中倍率写为最短形式（2.0 -> 2，0.25 保持不变）"""
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else value
+    return value
+
+
+# --- 持久化结果缓存 ---
+
+def data_fingerprint(paths: List[str]) -> str:
+    """计算数据文件内容指纹，任一文件内容变化都会得到新的指纹"""
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                digest.update(chunk)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    基于SQLite的持久化结果缓存，供多次命令行调用共享
+    - 键：（数据指纹, 类别, 标准化输入），类别为 name（名称解析）或 relations（克制关系）
+    - 打开时若数据指纹与上次不同，自动清空旧结果
+    - 写入先累积在同一事务中，flush()/close() 时统一提交
+    - 缓存仅作加速用途，读写失败时静默降级为不缓存
+    """
+    def __init__(self, path: str, fingerprint: str):
+        self.path = path
+        self.fingerprint = fingerprint
+        self._conn = sqlite3.connect(path, timeout=5)
+        with self._conn:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS entries ('
+                               'fingerprint TEXT, kind TEXT, key TEXT, value TEXT, '
+                               'PRIMARY KEY (fingerprint, kind, key))')
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+            if row is None or row[0] != fingerprint:
+                self._conn.execute('DELETE FROM entries WHERE fingerprint != ?', (fingerprint,))
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)", (fingerprint,))
+
+    def get(self, kind: str, key: str) -> Any:
+        """读取缓存，未命中返回None"""
+        try:
+            row = self._conn.execute(
+                'SELECT value FROM entries WHERE fingerprint = ? AND kind = ? AND key = ?',
+                (self.fingerprint, kind, key)).fetchone()
+        except sqlite3.Error:
+            return None
+        return json.loads(row[0]) if row else None
+
+    def put(self, kind: str, key: str, value: Any) -> None:
+        """写入缓存（暂不提交）"""
+        try:
+            self._conn.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)',
+                               (self.fingerprint, kind, key, json.dumps(value, ensure_ascii=False)))
+        except sqlite3.Error:
+            pass
+
+    def flush(self) -> None:
+        """提交尚未提交的写入"""
+        try:
+            self._conn.commit()
+        except sqlite3.Error:
+            pass
+
+    def close(self) -> None:
+        self.flush()
+        self._conn.close()
+
+
+def open_result_cache(type_chart_path: str = TYPE_CHART_PATH,
+                      name_type_map_path: str = NAME_TYPE_MAP_PATH,
+                      cache_path: str = CACHE_PATH) -> Optional[ResultCache]:
+    """打开与数据文件内容及缓存版本绑定的持久化缓存，无法打开时提示并返回None"""
+    try:
+        fingerprint = f"v{CACHE_VERSION}:{data_fingerprint([type_chart_path, name_type_map_path])}"
+        return ResultCache(cache_path, fingerprint)
+    except (OSError, sqlite3.Error) as e:
+        print(f"[警告] 无法启用结果缓存: {e}", file=sys.stderr)
+        return None
+
+
+# --- 常驻服务（Unix套接字） ---
+
+def handle_request(engine: TypeEngine, request: Dict[str, Any]) -> Any:
+    """
+    执行一次查询请求，供常驻服务与客户端进程内回退共用
+    :param request: {'type': [...]} 或 {'name': [...]}
+    :raises ValueError: 请求格式错误
+    """
+    if not isinstance(request, dict):
+        raise ValueError('请求应为JSON对象，如 {"type": ["火"]}')
+    for key in ('type', 'name'):
+        values = request.get(key)
+        if values is not None and not (isinstance(values, list) and all(isinstance(v, str) for v in values)):
+            raise ValueError(f'请求字段 {key} 应为字符串列表')
+    if request.get('type'):
+        return engine.query_types(request['type'])
+    if request.get('name'):
+        return [engine.query_name(name) for name in request['name']]
+    raise ValueError('请求需包含 type 或 name')
+
+
+class _QueryHandler(socketserver.StreamRequestHandler):
+    """
+    每个连接读取一行JSON请求，返回格式化后的JSON结果并关闭连接
+    请求须在 REQUEST_TIMEOUT 秒内到达，否则放弃该连接，继续处理后续请求
+    """
+    timeout = REQUEST_TIMEOUT
+
+    def handle(self):
+        try:
+            line = self.rfile.readline()
+        except OSError:
+            # 超时或客户端断开
+            return
+        try:
+            request = json.loads(line.decode('utf-8'))
+            result = handle_request(self.server.engine, request)
+            if self.server.engine.cache is not None:
+                self.server.engine.cache.flush()
+        except (ValueError, KeyError, TypeError) as e:
+            result = {'错误': str(e)}
+        try:
+            self.wfile.write(json.dumps(result, ensure_ascii=False, indent=2).encode('utf-8') + b'\n')
+        except OSError:
+            pass
+
+
+def serve(engine: TypeEngine, socket_path: str = SOCKET_PATH) -> None:
+    """
+    启动常驻查询服务：预先加载并编译全部数据，在本地Unix套接字上顺序处理请求
+    单个连接等待请求的时间不超过 REQUEST_TIMEOUT 秒
+    名称映射表已在后台加载时（load_names(background=True)）立即开始接受请求
+    套接字文件已存在但无服务监听时自动清理；Ctrl+C退出并删除套接字文件
+    :raises OSError: 服务已在运行，或路径已被非套接字文件占用
+    """
+    if os.path.exists(socket_path):
+        if not stat.S_ISSOCK(os.stat(socket_path).st_mode):
+            raise OSError(f"路径已存在且不是套接字文件: {socket_path}")
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_path)
+            raise OSError(f"常驻服务已在运行: {socket_path}")
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.remove(socket_path)
+        finally:
+            probe.close()
+    engine._ensure_chart()
+    engine.load_names()
+    server = socketserver.UnixStreamServer(socket_path, _QueryHandler)
+    server.engine = engine
+    print(f"[服务] 已启动，监听 {socket_path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def _print_progress(records: int, bytes_read: int, total: int) -> None:
+    """输出名称映射表加载进度"""
+    percent = bytes_read * 100 // total if total else 100
+    end = '\n' if bytes_read >= total else ''
+    print(f"\r[加载] 名称映射表 {records} 条，{percent}%", end=end, file=sys.stderr, flush=True)
+
+
+def main():
+    """
+    命令行入口，支持属性和宝可梦名称查询
+    """
+    parser = argparse.ArgumentParser(description='宝可梦属性克制关系查询引擎')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('-t', '--type', nargs='+', help='属性名称（可多个，自动组合）')
+    group.add_argument('-n', '--name', nargs='+', help='宝可梦名称（可多个，逐个查询）')
+    group.add_argument('--team_a', nargs='+', help='队伍对战矩阵：队伍A成员名称（需配合--team_b）')
+    group.add_argument('--bracket', help='赛程文件路径（JSON列表，每项包含“队伍A”“队伍B”）')
+    group.add_argument('--metagame', help='使用率分布文件路径（JSON对象：宝可梦名称 -> 使用率），需配合--teams')
+    group.add_argument('--counter', nargs='+', help='克制推荐：对手宝可梦名称（单只或整队）')
+    group.add_argument('--export', metavar='OUT_DIR', help='导出全量倍率表（宝可梦×攻击属性、属性组合×攻击属性）到指定目录')
+    group.add_argument('--serve', action='store_true', help='以常驻服务方式运行，监听本地Unix套接字')
+    parser.add_argument('--team_b', nargs='+', help='队伍对战矩阵：队伍B成员名称')
+    parser.add_argument('--teams', help='候选队伍文件路径（JSON列表，每项为成员名称列表）')
+    parser.add_argument('--samples', type=int, default=0, help='环境模拟：蒙特卡洛抽样对手数量（默认不抽样）')
+    parser.add_argument('--seed', type=int, help='环境模拟：随机种子')
+    parser.add_argument('--top_k', type=int, default=10, help='克制推荐：返回数量')
+    parser.add_argument('--exclude_types', nargs='+', help='克制推荐：排除含有这些属性的候选')
+    parser.add_argument('--allow', nargs='+', help='克制推荐：只在这些宝可梦中推荐')
+    parser.add_argument('--export_format', nargs='+', choices=EXPORT_FORMATS, default=list(EXPORT_FORMATS),
+                        help='导出格式（默认全部）')
+    parser.add_argument('--type_chart', default=TYPE_CHART_PATH, help='属性克制关系数据文件路径')
+    parser.add_argument('--name_type_map', default=NAME_TYPE_MAP_PATH, help='宝可梦名称与属性映射数据文件路径')
+    parser.add_argument('--cache', action='store_true', help='启用本地持久化结果缓存')
+    parser.add_argument('--cache_path', default=CACHE_PATH, help='持久化缓存文件路径')
+    parser.add_argument('--socket', default=SOCKET_PATH, help='常驻服务Unix套接字路径')
+    parser.add_argument('--progress', action='store_true', help='加载名称映射表时输出进度')
+    parser.add_argument('--partial', action='store_true',
+                        help='常驻服务在名称映射表加载完成前即按已加载部分回答查询')
+    args = parser.parse_args()
+    if bool(args.team_a) != bool(args.team_b):
+        parser.error('--team_a 与 --team_b 需同时指定')
+    if args.metagame and not args.teams:
+        parser.error('--metagame 需配合 --teams 指定候选队伍文件')
+    if args.serve and not hasattr(socket, 'AF_UNIX'):
+        parser.error('当前平台不支持Unix套接字，无法启动常驻服务')
+
+    cache = open_result_cache(args.type_chart, args.name_type_map, args.cache_path) if args.cache else None
+    engine = TypeEngine(args.type_chart, args.name_type_map, cache=cache)
+    try:
+        if args.progress and not args.export:
+            engine.load_names(progress=_print_progress, background=args.serve and args.partial,
+                              partial=args.partial)
+        elif args.serve and args.partial:
+            engine.load_names(background=True, partial=True)
+        if args.serve:
+            serve(engine, args.socket)
+            return
+        if args.export:
+            result = engine.export_tables(args.export, tuple(args.export_format),
+                                          progress=_print_progress if args.progress else None)
+        elif args.type or args.name:
+            result = handle_request(engine, {'type': args.type, 'name': args.name})
+        elif args.team_a:
+            result = engine.team_matchup(args.team_a, args.team_b)
+        elif args.counter:
+            result = engine.recommend_counters(args.counter, args.top_k, args.exclude_types, args.allow)
+        elif args.metagame:
+            result = engine.evaluate_metagame(_load_json(args.teams), _load_json(args.metagame),
+                                              samples=args.samples, seed=args.seed)
+        else:
+            result = engine.bracket_matchups(_load_json(args.bracket))
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        if engine.skipped_names:
+            shown = '、'.join(engine.skipped_names[:10])
+            more = f" 等{len(engine.skipped_names)}条" if len(engine.skipped_names) > 10 else ''
+            print(f"[警告] 名称映射表中以下记录属性无法识别，已跳过: {shown}{more}", file=sys.stderr)
+    except (OSError, ValueError) as e:
+        # 数据文件缺失、输入文件格式错误或常驻服务无法启动：给出提示而非堆栈
+        print(f"[错误] {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        # 本次调用的缓存写入统一提交
+        if cache is not None:
+            cache.close()
+
+
+if __name__ == '__main__':
+    main()